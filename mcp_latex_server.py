@@ -13,28 +13,15 @@ import logging
 import subprocess
 import shutil
 import re
-from typing import Dict, List, Optional, Any
+import stat
+import tempfile
+import functools
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Set, Tuple, Union, Any
 from pathlib import Path
 from datetime import datetime
 
-# MCP SDK imports - Install with: pip install mcp
-try:
-    from mcp.server import Server
-    from mcp.types import Tool, TextContent
-    from mcp.server.stdio import stdio_server
-except ImportError as e:
-    print(f"Error importing MCP: {e}", file=sys.stderr)
-    print("Install with: pip install mcp", file=sys.stderr)
-    sys.exit(1)
-
-# Optional imports
-try:
-    import aiofiles
-    AIOFILES_AVAILABLE = True
-except ImportError:
-    AIOFILES_AVAILABLE = False
-    print("Warning: aiofiles not available. Using synchronous file operations.", file=sys.stderr)
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -42,113 +29,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class LaTeXServer:
-    """
-    Main MCP server class for LaTeX operations.
-    Handles file management, compilation, validation and template generation.
-    """
-    
-    def __init__(self, workspace_dir: str = None):
-        """
-        Initialize the LaTeX MCP server.
-        
-        Args:
-            workspace_dir: Default workspace directory for LaTeX projects
-        """
-        self.server = Server("latex-server")
-        self.workspace_dir = Path(workspace_dir) if workspace_dir else Path.cwd()
-        
-        # Ensure workspace directory exists
-        self.workspace_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Supported LaTeX engines
-        self.supported_engines = ['pdflatex', 'lualatex', 'xelatex', 'bibtex', 'biber']
-        
-        # File extensions categorization
-        self.supported_extensions = {
-            'source': ['.tex', '.bib', '.cls', '.sty', '.bst'],
-            'auxiliary': ['.aux', '.log', '.bbl', '.blg', '.toc', '.lof', '.lot', 
-                        '.idx', '.ind', '.out', '.nav', '.snm', '.vrb', '.fls', 
-                        '.fdb_latexmk', '.synctex.gz', '.bcf', '.run.xml'],
-            'output': ['.pdf', '.dvi', '.ps']
-        }
-        
-        # Supported document classes
-        self.document_classes = ['article', 'report', 'book', 'letter', 'beamer', 
-                                'memoir', 'scrartcl', 'scrreprt', 'scrbook']
-        
-        # Detect TeX distribution
-        self.tex_distribution = self._detect_tex_distribution()
-        logger.info(f"Detected TeX distribution: {self.tex_distribution or 'None'}")
-        
-        # Register all tools
-        self._register_tools()
-    
-    def _detect_tex_distribution(self) -> Optional[str]:
-        """
-        Detect installed TeX distribution.
-        
-        Returns:
-            Name of detected distribution or None
-        """
-        try:
-            # Try to run tex command
-            result = subprocess.run(['tex', '--version'], 
-                                capture_output=True, text=True, timeout=5)
-            if 'TeX Live' in result.stdout:
-                return 'texlive'
-            elif 'MiKTeX' in result.stdout:
-                return 'miktex'
-        except Exception:
-            pass
-        
-        # Check common installation paths
-        if sys.platform == 'win32':
-            if Path('C:/texlive').exists():
-                return 'texlive'
-            elif Path('C:/Program Files/MiKTeX').exists() or Path('C:/Program Files (x86)/MiKTeX').exists():
-                return 'miktex'
-        else:
-            if Path('/usr/local/texlive').exists() or Path('/opt/texlive').exists():
-                return 'texlive'
-        
-        logger.warning("No TeX distribution detected. Compilation features may not work.")
-        return None
-    
-    def _get_full_path(self, filename: str, path: Optional[str] = None) -> Path:
-        """
-        Get full path for a file.
-        
-        Args:
-            filename: Name of the file
-            path: Optional path relative to workspace
-            
-        Returns:
-            Full path to the file
-        """
-        if path:
-            base_path = Path(path)
-            if base_path.is_absolute():
-                return base_path / filename
-            return self.workspace_dir / path / filename
-        return self.workspace_dir / filename
+# Working directory at startup, the default workspace
+_DEFAULT_WORKSPACE = os.getcwd()
 
-    def _get_latex_template(self, document_class: str, options: Optional[Dict] = None) -> str:
-        """
-        Generate LaTeX template for given document class.
-        
-        Args:
-            document_class: LaTeX document class
-            options: Additional options for template
-            
-        Returns:
-            LaTeX template as string
-        """
-        options = options or {}
-        
-        # Basic templates by document class
-        templates = {
-            'article': '''\\documentclass[11pt,a4paper]{article}
+# Files at least this large are read/written in a worker thread; smaller
+# ones are cheaper to handle directly than to hand off
+_LARGE_FILE_THRESHOLD = 1024 * 1024
+
+# Number of validate_latex_syntax results kept per server
+_VALIDATION_CACHE_SIZE = 64
+
+# Most buffers a single os.writev() call accepts
+try:
+    _IOV_MAX = max(os.sysconf('SC_IOV_MAX'), 16)
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 16
+
+# Shared encoder for tool results: compact output, non-ASCII kept as-is
+_JSON_ENCODER = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+# Precompiled patterns used by validate_latex_syntax
+_RE_REF = re.compile(r'\\ref\{([^}]+)\}')
+_RE_LABEL = re.compile(r'\\label\{([^}]+)\}')
+
+# Basic templates by document class, built once at import time
+_TEMPLATES: Mapping[str, str] = MappingProxyType({
+    'article': '''\\documentclass[11pt,a4paper]{article}
 
 \\usepackage[utf8]{inputenc}
 \\usepackage[T1]{fontenc}
@@ -179,8 +85,8 @@ Your content here.
 Your conclusion here.
 
 \\end{document}''',
-            
-            'report': '''\\documentclass[11pt,a4paper]{report}
+    
+    'report': '''\\documentclass[11pt,a4paper]{report}
 
 \\usepackage[utf8]{inputenc}
 \\usepackage[T1]{fontenc}
@@ -212,8 +118,8 @@ Your main content here.
 Your conclusion here.
 
 \\end{document}''',
-            
-            'beamer': '''\\documentclass{beamer}
+    
+    'beamer': '''\\documentclass{beamer}
 
 \\usetheme{Madrid}
 \\usecolortheme{default}
@@ -255,13 +161,386 @@ Your conclusion here.
 \\end{frame}
 
 \\end{document}'''
+})
+
+
+@functools.lru_cache(maxsize=1)
+def _detect_tex_distribution() -> Optional[str]:
+    """
+    Detect installed TeX distribution.
+    
+    The result cannot change while the process runs, so it is computed once.
+    
+    Returns:
+        Name of detected distribution or None
+    """
+    try:
+        # Try to run tex command
+        result = subprocess.run(['tex', '--version'], 
+                            capture_output=True, text=True, timeout=5)
+        if 'TeX Live' in result.stdout:
+            return 'texlive'
+        elif 'MiKTeX' in result.stdout:
+            return 'miktex'
+    except Exception:
+        pass
+    
+    # Check common installation paths
+    if sys.platform == 'win32':
+        if Path('C:/texlive').exists():
+            return 'texlive'
+        elif Path('C:/Program Files/MiKTeX').exists() or Path('C:/Program Files (x86)/MiKTeX').exists():
+            return 'miktex'
+    else:
+        if Path('/usr/local/texlive').exists() or Path('/opt/texlive').exists():
+            return 'texlive'
+    
+    logger.warning("No TeX distribution detected. Compilation features may not work.")
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def _load_numpy():
+    """
+    Import NumPy on first use (optional dependency).
+    
+    Returns:
+        The numpy module, or None if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _first_unmatched_closing_brace(content: str) -> Optional[int]:
+    """
+    Locate the first closing brace that has no matching opening brace.
+    
+    Runs as a vectorized prefix sum over the UTF-8 bytes ('{' and '}' never
+    occur inside multi-byte sequences). Requires NumPy.
+    
+    Args:
+        content: Document source
+        
+    Returns:
+        1-based line number of the first stray '}', or None
+    """
+    np = _load_numpy()
+    data = np.frombuffer(content.encode('utf-8'), dtype=np.uint8)
+    depth = (data == 0x7B).astype(np.int32) - (data == 0x7D)
+    np.cumsum(depth, out=depth)
+    
+    negative = depth < 0
+    if not negative.any():
+        return None
+    
+    position = int(np.argmax(negative))
+    return int(np.count_nonzero(data[:position] == 0x0A)) + 1
+
+
+def _remove_files_by_extension(dir_path: Path, extensions: Set[str]) -> Tuple[List[str], int]:
+    """
+    Delete the files of a directory whose suffix is in extensions.
+    
+    Args:
+        dir_path: Directory to clean (not recursive)
+        extensions: Lower-case suffixes to remove
+        
+    Returns:
+        Names of the removed files and their total size in bytes
+    """
+    removed_files = []
+    total_size = 0
+    
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_file() and Path(entry.path).suffix.lower() in extensions:
+                size = entry.stat().st_size
+                os.unlink(entry.path)
+                removed_files.append(entry.name)
+                total_size += size
+    
+    return removed_files, total_size
+
+
+def _is_pollable_pipe(fd: int) -> bool:
+    """
+    Check whether fd is a pipe or socket the event loop can poll.
+    
+    Args:
+        fd: File descriptor
+        
+    Returns:
+        True on POSIX for FIFOs and sockets, False otherwise
+    """
+    if sys.platform == 'win32':
+        return False
+    try:
+        mode = os.fstat(fd).st_mode
+    except OSError:
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)
+
+
+class _StdinLineReader:
+    """
+    Newline-delimited message reader for the MCP stdio transport.
+    
+    Reads the file descriptor directly into one reusable buffer whenever the
+    event loop reports it readable, instead of going through the SDK's
+    thread-backed text wrapper. Lines are yielded as bytes, which the SDK's
+    JSON-RPC parser accepts as-is, so no intermediate str is built.
+    """
+    
+    def __init__(self, fd: int, buffer_size: int = 64 * 1024):
+        self._fd = fd
+        self._buffer = memoryview(bytearray(buffer_size))
+        self._pending = bytearray()
+        self._scanned = 0
+        self._eof = False
+        self._was_blocking = os.get_blocking(fd)
+        os.set_blocking(fd, False)
+    
+    @classmethod
+    def for_fd(cls, fd: int) -> Optional['_StdinLineReader']:
+        """
+        Create a reader if fd can be polled by the event loop.
+        
+        Args:
+            fd: File descriptor to read from
+            
+        Returns:
+            Reader for pipes and sockets on POSIX, None otherwise
+        """
+        if not hasattr(os, 'readv') or not _is_pollable_pipe(fd):
+            return None
+        return cls(fd)
+    
+    def close(self) -> None:
+        """Restore the descriptor's original blocking mode."""
+        os.set_blocking(self._fd, self._was_blocking)
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> bytes:
+        while True:
+            # Only scan bytes that arrived since the last search
+            end = self._pending.find(b'\n', self._scanned)
+            if end != -1:
+                line = bytes(self._pending[:end + 1])
+                del self._pending[:end + 1]
+                self._scanned = 0
+                return line
+            self._scanned = len(self._pending)
+            
+            if self._eof:
+                if not self._pending:
+                    raise StopAsyncIteration
+                line = bytes(self._pending)
+                self._pending.clear()
+                self._scanned = 0
+                return line
+            
+            count = await self._read_into_buffer()
+            if count == 0:
+                self._eof = True
+            else:
+                self._pending += self._buffer[:count]
+    
+    async def _read_into_buffer(self) -> int:
+        """Read available bytes into the reusable buffer, waiting if none."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                return os.readv(self._fd, [self._buffer])
+            except BlockingIOError:
+                pass
+            
+            readable = loop.create_future()
+            loop.add_reader(self._fd, lambda: readable.done() or readable.set_result(None))
+            try:
+                await readable
+            finally:
+                loop.remove_reader(self._fd)
+
+
+class _StdoutFrameWriter:
+    """
+    Message writer for the MCP stdio transport.
+    
+    Queues encoded frames on write() and sends everything queued with a
+    single os.writev() on flush(), waiting on the event loop when the pipe
+    is full instead of blocking a worker thread.
+    """
+    
+    def __init__(self, fd: int):
+        self._fd = fd
+        self._frames: List[bytes] = []
+        self._was_blocking = os.get_blocking(fd)
+        os.set_blocking(fd, False)
+    
+    @classmethod
+    def for_fd(cls, fd: int) -> Optional['_StdoutFrameWriter']:
+        """
+        Create a writer if fd can be polled by the event loop.
+        
+        Args:
+            fd: File descriptor to write to
+            
+        Returns:
+            Writer for pipes and sockets on POSIX, None otherwise
+        """
+        if not hasattr(os, 'writev') or not _is_pollable_pipe(fd):
+            return None
+        # Non-blocking mode is per open file: don't impose it on stderr
+        # when both share one pipe (e.g. 2>&1)
+        try:
+            if os.path.sameopenfile(fd, sys.stderr.fileno()):
+                return None
+        except (OSError, ValueError, AttributeError):
+            return None
+        return cls(fd)
+    
+    def close(self) -> None:
+        """Restore the descriptor's original blocking mode."""
+        os.set_blocking(self._fd, self._was_blocking)
+    
+    async def write(self, data: str) -> int:
+        self._frames.append(data.encode('utf-8'))
+        return len(data)
+    
+    async def flush(self) -> None:
+        views = [memoryview(frame) for frame in self._frames]
+        self._frames.clear()
+        
+        while views:
+            try:
+                written = os.writev(self._fd, views[:_IOV_MAX])
+            except BlockingIOError:
+                await self._wait_writable()
+                continue
+            
+            # Drop fully written frames, re-slice a partially written one
+            while views and written >= len(views[0]):
+                written -= len(views.pop(0))
+            if written:
+                views[0] = views[0][written:]
+    
+    async def _wait_writable(self) -> None:
+        """Wait until the pipe has room again."""
+        loop = asyncio.get_running_loop()
+        writable = loop.create_future()
+        loop.add_writer(self._fd, lambda: writable.done() or writable.set_result(None))
+        try:
+            await writable
+        finally:
+            loop.remove_writer(self._fd)
+
+
+class LaTeXServer:
+    """
+    Main MCP server class for LaTeX operations.
+    Handles file management, compilation, validation and template generation.
+    """
+    
+    def __init__(self, workspace_dir: Union[str, Path] = None):
+        """
+        Initialize the LaTeX MCP server.
+        
+        Args:
+            workspace_dir: Default workspace directory for LaTeX projects
+        """
+        # MCP SDK imports - Install with: pip install mcp
+        # Imported here rather than at module level so --help/--version
+        # don't pay for loading the SDK
+        try:
+            from mcp.server import Server
+        except ImportError as e:
+            print(f"Error importing MCP: {e}", file=sys.stderr)
+            print("Install with: pip install mcp", file=sys.stderr)
+            sys.exit(1)
+        
+        self.server = Server("latex-server")
+        if isinstance(workspace_dir, Path):
+            self.workspace_dir = workspace_dir
+        else:
+            self.workspace_dir = Path(workspace_dir or _DEFAULT_WORKSPACE)
+        
+        # Ensure workspace directory exists
+        self.workspace_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Supported LaTeX engines
+        self.supported_engines = frozenset({'pdflatex', 'lualatex', 'xelatex', 'bibtex', 'biber'})
+        
+        # File extensions categorization
+        self.supported_extensions = {
+            'source': frozenset({'.tex', '.bib', '.cls', '.sty', '.bst'}),
+            'auxiliary': frozenset({'.aux', '.log', '.bbl', '.blg', '.toc', '.lof', '.lot', 
+                                    '.idx', '.ind', '.out', '.nav', '.snm', '.vrb', '.fls', 
+                                    '.fdb_latexmk', '.synctex.gz', '.bcf', '.run.xml'}),
+            'output': frozenset({'.pdf', '.dvi', '.ps'})
         }
         
-        return templates.get(document_class, templates['article'])
+        # Supported document classes
+        self.document_classes = frozenset({'article', 'report', 'book', 'letter', 'beamer', 
+                                           'memoir', 'scrartcl', 'scrreprt', 'scrbook'})
+        
+        # Resolved executable paths, filled lazily by _resolve_executable
+        self._executables: Dict[str, str] = {}
+        
+        # Recent validation results keyed by (path, mtime_ns, size)
+        self._validation_cache: OrderedDict = OrderedDict()
+        
+        # One lock per document so compiles of the same file run one at a time
+        self._compile_locks: Dict[str, asyncio.Lock] = {}
+        
+        # Caps batch compiles at one engine process per core, across all batches
+        self._batch_limit = asyncio.Semaphore(os.cpu_count() or 1)
+        
+        # Detect TeX distribution
+        self.tex_distribution = _detect_tex_distribution()
+        logger.info("Detected TeX distribution: %s", self.tex_distribution or 'None')
+        
+        # Register all tools
+        self._register_tools()
+    
+    def _get_full_path(self, filename: str, path: Optional[str] = None) -> Path:
+        """
+        Get full path for a file.
+        
+        Args:
+            filename: Name of the file
+            path: Optional path relative to workspace
+            
+        Returns:
+            Full path to the file
+        """
+        if path:
+            base_path = Path(path)
+            if base_path.is_absolute():
+                return base_path / filename
+            return self.workspace_dir / path / filename
+        return self.workspace_dir / filename
+
+    def _get_latex_template(self, document_class: str, options: Optional[Dict] = None) -> str:
+        """
+        Get LaTeX template for given document class.
+        
+        Args:
+            document_class: LaTeX document class
+            options: Additional options for template
+            
+        Returns:
+            LaTeX template as string
+        """
+        return _TEMPLATES.get(document_class, _TEMPLATES['article'])
 
     async def _read_file_async(self, file_path: Path) -> str:
         """
-        Read file asynchronously if aiofiles is available, synchronously otherwise.
+        Read file directly if small, in a worker thread otherwise.
         
         Args:
             file_path: Path to file
@@ -269,41 +548,107 @@ Your conclusion here.
         Returns:
             File content as string
         """
-        if AIOFILES_AVAILABLE:
-            try:
-                async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                    return await f.read()
-            except Exception:
-                # Fallback to sync
-                pass
-        
-        # Synchronous fallback
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        if file_path.stat().st_size < _LARGE_FILE_THRESHOLD:
+            return file_path.read_text(encoding='utf-8')
+        return await asyncio.to_thread(file_path.read_text, encoding='utf-8')
 
     async def _write_file_async(self, file_path: Path, content: str) -> None:
         """
-        Write file asynchronously if aiofiles is available, synchronously otherwise.
+        Write file directly if small, in a worker thread otherwise.
         
         Args:
             file_path: Path to file
             content: Content to write
         """
-        if AIOFILES_AVAILABLE:
-            try:
-                async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
-                    await f.write(content)
-                return
-            except Exception:
-                # Fallback to sync
-                pass
+        if len(content) < _LARGE_FILE_THRESHOLD:
+            file_path.write_text(content, encoding='utf-8')
+        else:
+            await asyncio.to_thread(file_path.write_text, content, encoding='utf-8')
+    
+    def _invalidate_validation(self, file_path: Path) -> None:
+        """
+        Drop cached validation results for a file.
+        
+        Args:
+            file_path: Path to the file that changed
+        """
+        path_key = str(file_path)
+        for key in [k for k in self._validation_cache if k[0] == path_key]:
+            del self._validation_cache[key]
+    
+    def _compile_lock(self, file_path: Path) -> asyncio.Lock:
+        """
+        Get the lock serialising compiles of a document.
+        
+        Args:
+            file_path: Path to the main .tex file
+            
+        Returns:
+            Lock shared by every compile of that file
+        """
+        key = os.path.normcase(str(file_path.resolve()))
+        lock = self._compile_locks.get(key)
+        if lock is None:
+            lock = self._compile_locks[key] = asyncio.Lock()
+        return lock
+    
+    def _resolve_executable(self, name: str) -> str:
+        """
+        Resolve a command name to its full path, searching PATH only once.
+        
+        Args:
+            name: Command name (e.g. pdflatex)
+            
+        Returns:
+            Full path to the executable, or the name unchanged if not found
+        """
+        executable = self._executables.get(name)
+        if executable is None:
+            executable = shutil.which(name)
+            if executable is None:
+                # Not installed (yet): don't cache, let the spawn report it
+                return name
+            self._executables[name] = executable
+        return executable
+    
+    async def _run_command(self, cmd: List[str], cwd: str, timeout: float) -> Dict[str, Any]:
+        """
+        Run an external command without blocking the event loop.
+        
+        Args:
+            cmd: Command and arguments
+            cwd: Working directory for the command
+            timeout: Maximum run time in seconds
+            
+        Returns:
+            Dictionary with stdout, stderr and returncode
+        """
+        proc = await asyncio.create_subprocess_exec(
+            self._resolve_executable(cmd[0]),
+            *cmd[1:],
+            cwd=cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        finally:
+            # Timed out or cancelled (e.g. the client cancelled the request):
+            # don't leave the engine running behind our back
+            if proc.returncode is None:
+                proc.kill()
+                await asyncio.shield(proc.wait())
         
-        # Synchronous fallback
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        return {
+            'stdout': stdout.decode('utf-8', errors='replace'),
+            'stderr': stderr.decode('utf-8', errors='replace'),
+            'returncode': proc.returncode
+        }
     
     def _register_tools(self):
         """Register all available tools with the MCP server."""
+        from mcp.types import Tool, TextContent
         
         @self.server.list_tools()
         async def list_tools() -> List[Tool]:
@@ -362,6 +707,24 @@ Your conclusion here.
                         "required": ["filename"]
                     }
                 ),
+                Tool(
+                    name="compile_latex_batch",
+                    description="Compile several independent LaTeX documents in parallel",
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "filenames": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Main .tex files to compile"
+                            },
+                            "engine": {"type": "string", "description": "LaTeX engine (pdflatex, lualatex, xelatex)"},
+                            "bibtex": {"type": "boolean", "description": "Run BibTeX/Biber"},
+                            "path": {"type": "string", "description": "Path relative to workspace"}
+                        },
+                        "required": ["filenames"]
+                    }
+                ),
                 Tool(
                     name="validate_latex_syntax",
                     description="Validate LaTeX syntax and check for common errors",
@@ -428,7 +791,7 @@ Your conclusion here.
         async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
             """Execute a tool and return the result."""
             try:
-                logger.info(f"Executing tool: {name} with arguments: {arguments}")
+                logger.info("Executing tool: %s with arguments: %s", name, arguments)
                 result = {}
                 
                 if name == "create_latex_file":
@@ -439,6 +802,8 @@ Your conclusion here.
                     result = await self.edit_latex_file(**arguments)
                 elif name == "compile_latex":
                     result = await self.compile_latex(**arguments)
+                elif name == "compile_latex_batch":
+                    result = await self.compile_latex_batch(**arguments)
                 elif name == "validate_latex_syntax":
                     result = await self.validate_latex_syntax(**arguments)
                 elif name == "list_latex_files":
@@ -452,11 +817,11 @@ Your conclusion here.
                 else:
                     result = {"error": f"Unknown tool: {name}"}
                 
-                return [TextContent(type="text", text=json.dumps(result, indent=2))]
+                return [TextContent(type="text", text=_JSON_ENCODER.encode(result))]
                 
             except Exception as e:
-                logger.error(f"Error executing tool {name}: {str(e)}")
-                return [TextContent(type="text", text=json.dumps({"error": str(e)}, indent=2))]
+                logger.error("Error executing tool %s: %s", name, e)
+                return [TextContent(type="text", text=_JSON_ENCODER.encode({"error": str(e)}))]
 
     # Tool implementation methods (keeping the existing implementations)
     async def create_latex_file(self, filename: str, content: str = None, 
@@ -473,6 +838,7 @@ Your conclusion here.
                     content = self._get_latex_template('article')
             
             await self._write_file_async(file_path, content)
+            self._invalidate_validation(file_path)
             
             return {
                 "success": True,
@@ -499,7 +865,7 @@ Your conclusion here.
                 "path": str(file_path),
                 "content": content,
                 "size": len(content),
-                "lines": len(content.split('\n'))
+                "lines": content.count('\n') + 1
             }
             
         except Exception as e:
@@ -509,18 +875,48 @@ Your conclusion here.
         """Edit an existing LaTeX file."""
         try:
             file_path = self._get_full_path(filename, path)
+            backup_created = False
             
-            if file_path.exists():
+            if not file_path.exists():
+                await self._write_file_async(file_path, content)
+            else:
+                # Edit the real file behind a symlink, not the link itself
+                target_path = file_path.resolve()
+                
+                # Hard-link the current version as the backup: no data is
+                # copied, and the new content below goes to a fresh inode
                 backup_path = file_path.with_suffix(file_path.suffix + '.bak')
-                shutil.copy2(file_path, backup_path)
+                if backup_path.exists():
+                    backup_path.unlink()
+                try:
+                    os.link(target_path, backup_path)
+                except OSError:
+                    # Hard links unsupported (e.g. FAT, some network shares)
+                    shutil.copy2(target_path, backup_path)
+                backup_created = True
+                
+                # Write to a private temporary file and swap it in atomically
+                # so the backup link is never modified and readers never see
+                # a partial file; keep the original permissions
+                fd, tmp_name = tempfile.mkstemp(dir=target_path.parent,
+                                                prefix=f'.{target_path.name}.', suffix='.tmp')
+                os.close(fd)
+                tmp_path = Path(tmp_name)
+                try:
+                    await self._write_file_async(tmp_path, content)
+                    shutil.copymode(target_path, tmp_path)
+                    os.replace(tmp_path, target_path)
+                except BaseException:
+                    tmp_path.unlink(missing_ok=True)
+                    raise
             
-            await self._write_file_async(file_path, content)
+            self._invalidate_validation(file_path)
             
             return {
                 "success": True,
                 "message": f"Updated LaTeX file: {file_path}",
                 "path": str(file_path),
-                "backup_created": file_path.exists()
+                "backup_created": backup_created
             }
             
         except Exception as e:
@@ -541,81 +937,115 @@ Your conclusion here.
             if engine not in self.supported_engines:
                 return {"error": f"Unsupported engine: {engine}"}
             
-            original_cwd = os.getcwd()
-            os.chdir(file_path.parent)
-            
+            # Compile in place so includes, relative paths and the .aux/.toc/.bbl
+            # state of earlier runs keep working; jobs on the same document are
+            # serialised so they never fight over those files
+            cwd = str(file_path.parent)
+            pdf_path = file_path.with_suffix('.pdf')
             results = {}
             
-            try:
-                cmd = [engine, '-interaction=nonstopmode', file_path.name]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            async with self._compile_lock(file_path):
+                pdf_before = pdf_path.stat().st_mtime_ns if pdf_path.exists() else None
+                
+                # Stop at the first error and never run \write18 commands
+                cmd = [engine, '-interaction=nonstopmode', '-halt-on-error',
+                       '-no-shell-escape', file_path.name]
+                result = await self._run_command(cmd, cwd, timeout=60)
                 
-                results['latex_output'] = result.stdout
-                results['latex_errors'] = result.stderr
-                results['latex_returncode'] = result.returncode
+                results['latex_output'] = result['stdout']
+                results['latex_errors'] = result['stderr']
+                results['latex_returncode'] = result['returncode']
                 
-                if bibtex:
-                    bib_files = list(file_path.parent.glob('*.bib'))
-                    if bib_files:
-                        bib_cmd = ['bibtex', file_path.stem]
-                        bib_result = subprocess.run(bib_cmd, capture_output=True, text=True, timeout=30)
-                        results['bibtex_output'] = bib_result.stdout
-                        results['bibtex_errors'] = bib_result.stderr
-                        
-                        result2 = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-                        results['latex_output_2'] = result2.stdout
+                # any() stops at the first .bib instead of listing them all
+                if bibtex and any(file_path.parent.glob('*.bib')):
+                    bib_cmd = ['bibtex', file_path.stem]
+                    bib_result = await self._run_command(bib_cmd, cwd, timeout=30)
+                    results['bibtex_output'] = bib_result['stdout']
+                    results['bibtex_errors'] = bib_result['stderr']
+                    
+                    result2 = await self._run_command(cmd, cwd, timeout=60)
+                    results['latex_output_2'] = result2['stdout']
                 
-                pdf_path = file_path.with_suffix('.pdf')
-                results['pdf_generated'] = pdf_path.exists()
+                # Only count a PDF written by this run, not a stale one
+                results['pdf_generated'] = (pdf_path.exists()
+                                            and pdf_path.stat().st_mtime_ns != pdf_before)
                 if results['pdf_generated']:
                     results['pdf_path'] = str(pdf_path)
-                
-                results['success'] = result.returncode == 0
-                
-            finally:
-                os.chdir(original_cwd)
+            
+            results['success'] = result['returncode'] == 0
             
             return results
             
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             return {"error": "Compilation timed out"}
         except Exception as e:
             return {"error": f"Compilation failed: {str(e)}"}
 
+    async def compile_latex_batch(self, filenames: List[str], engine: str = "pdflatex",
+                                  bibtex: bool = False, path: str = None) -> Dict[str, Any]:
+        """Compile several independent LaTeX documents in parallel."""
+        try:
+            if (not isinstance(filenames, list) or not filenames
+                    or not all(isinstance(f, str) for f in filenames)):
+                return {"error": "filenames must be a non-empty list of file names"}
+            
+            async def compile_one(filename: str) -> Dict[str, Any]:
+                async with self._batch_limit:
+                    result = await self.compile_latex(filename, engine, bibtex, path)
+                return {"filename": filename, **result}
+            
+            results = await asyncio.gather(*(compile_one(f) for f in filenames))
+            
+            return {
+                "success": all(r.get('success', False) for r in results),
+                "results": results,
+                "total_files": len(results),
+                "total_succeeded": sum(1 for r in results if r.get('success', False))
+            }
+            
+        except Exception as e:
+            return {"error": f"Batch compilation failed: {str(e)}"}
+
     async def validate_latex_syntax(self, filename: str, path: str = None) -> Dict[str, Any]:
         """Validate LaTeX syntax and check for common errors."""
         try:
             file_path = self._get_full_path(filename, path)
             
-            if not file_path.exists():
+            try:
+                st = file_path.stat()
+            except FileNotFoundError:
                 return {"error": f"File does not exist: {file_path}"}
             
+            # Unchanged files return their previous result without a re-read
+            cache_key = (str(file_path), st.st_mtime_ns, st.st_size)
+            cached = self._validation_cache.get(cache_key)
+            if cached is not None:
+                self._validation_cache.move_to_end(cache_key)
+                return cached
+            
             content = await self._read_file_async(file_path)
             
             warnings = []
             errors = []
             
-            lines = content.split('\n')
-            
             # Check for balanced braces
-            brace_count = 0
-            for i, line in enumerate(lines, 1):
-                for char in line:
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count < 0:
-                            errors.append(f"Line {i}: Unmatched closing brace")
-                            brace_count = 0
-            
-            if brace_count > 0:
-                errors.append(f"Unmatched opening braces: {brace_count}")
+            open_braces = content.count('{')
+            close_braces = content.count('}')
+            
+            if _load_numpy() is not None:
+                stray_line = _first_unmatched_closing_brace(content)
+                if stray_line is not None:
+                    errors.append(f"Line {stray_line}: Unmatched closing brace")
+            
+            if close_braces > open_braces:
+                errors.append(f"Unmatched closing braces: {close_braces - open_braces}")
+            elif open_braces > close_braces:
+                errors.append(f"Unmatched opening braces: {open_braces - close_braces}")
             
             # Check for document structure
-            has_documentclass = bool(re.search(r'\\documentclass', content))
-            has_begin_document = bool(re.search(r'\\begin\{document\}', content))
-            has_end_document = bool(re.search(r'\\end\{document\}', content))
+            has_documentclass = '\\documentclass' in content
+            has_begin_document = '\\begin{document}' in content
+            has_end_document = '\\end{document}' in content
             
             if not has_documentclass:
                 errors.append("Missing \\documentclass command")
@@ -629,14 +1059,15 @@ Your conclusion here.
                 warnings.append("Unmatched math mode delimiters ($)")
             
             # Check for undefined references
-            refs = re.findall(r'\\ref\{([^}]+)\}', content)
-            labels = re.findall(r'\\label\{([^}]+)\}', content)
-            undefined_refs = [ref for ref in refs if ref not in labels]
+            labels = set(_RE_LABEL.findall(content))
+            undefined_refs = list(dict.fromkeys(
+                ref for ref in _RE_REF.findall(content) if ref not in labels
+            ))
             
             if undefined_refs:
                 warnings.append(f"Potentially undefined references: {', '.join(undefined_refs)}")
             
-            return {
+            result = {
                 "success": True,
                 "path": str(file_path),
                 "errors": errors,
@@ -645,6 +1076,12 @@ Your conclusion here.
                 "structure_complete": has_documentclass and has_begin_document and has_end_document
             }
             
+            self._validation_cache[cache_key] = result
+            if len(self._validation_cache) > _VALIDATION_CACHE_SIZE:
+                self._validation_cache.popitem(last=False)
+            
+            return result
+            
         except Exception as e:
             return {"error": f"Validation failed: {str(e)}"}
 
@@ -664,31 +1101,31 @@ Your conclusion here.
                 'auxiliary_files': []
             }
             
-            for file_path in dir_path.iterdir():
-                if file_path.is_file():
-                    suffix = file_path.suffix.lower()
+            # scandir entries carry the file type from the directory read and
+            # cache their stat result, so each file costs at most one stat
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    
+                    suffix = Path(entry.path).suffix.lower()
                     
                     if suffix in self.supported_extensions['source']:
-                        files['source_files'].append({
-                            'name': file_path.name,
-                            'path': str(file_path),
-                            'size': file_path.stat().st_size,
-                            'modified': datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
-                        })
+                        category = 'source_files'
                     elif suffix in self.supported_extensions['output']:
-                        files['output_files'].append({
-                            'name': file_path.name,
-                            'path': str(file_path),
-                            'size': file_path.stat().st_size,
-                            'modified': datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
-                        })
+                        category = 'output_files'
                     elif suffix in self.supported_extensions['auxiliary'] and include_auxiliary:
-                        files['auxiliary_files'].append({
-                            'name': file_path.name,
-                            'path': str(file_path),
-                            'size': file_path.stat().st_size,
-                            'modified': datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
-                        })
+                        category = 'auxiliary_files'
+                    else:
+                        continue
+                    
+                    st = entry.stat()
+                    files[category].append({
+                        'name': entry.name,
+                        'path': entry.path,
+                        'size': st.st_size,
+                        'modified': datetime.fromtimestamp(st.st_mtime).isoformat()
+                    })
             
             return {
                 "success": True,
@@ -715,21 +1152,16 @@ Your conclusion here.
             if not dir_path.exists():
                 return {"error": f"Directory does not exist: {dir_path}"}
             
-            removed_files = []
-            total_size = 0
-            
-            extensions_to_remove = self.supported_extensions['auxiliary'].copy()
+            extensions_to_remove = set(self.supported_extensions['auxiliary'])
             if not keep_pdf:
-                extensions_to_remove.extend(self.supported_extensions['output'])
-            elif '.pdf' in extensions_to_remove:
-                extensions_to_remove.remove('.pdf')
+                extensions_to_remove |= self.supported_extensions['output']
+            else:
+                extensions_to_remove.discard('.pdf')
             
-            for file_path in dir_path.iterdir():
-                if file_path.is_file() and file_path.suffix.lower() in extensions_to_remove:
-                    size = file_path.stat().st_size
-                    file_path.unlink()
-                    removed_files.append(file_path.name)
-                    total_size += size
+            # The walk is one stat and one unlink per file: keep it off the event loop
+            removed_files, total_size = await asyncio.to_thread(
+                _remove_files_by_extension, dir_path, extensions_to_remove
+            )
             
             return {
                 "success": True,
@@ -749,7 +1181,7 @@ Your conclusion here.
             if document_class not in self.document_classes:
                 return {
                     "error": f"Unsupported document class: {document_class}",
-                    "supported_classes": self.document_classes
+                    "supported_classes": sorted(self.document_classes)
                 }
             
             template = self._get_latex_template(document_class, options)
@@ -764,21 +1196,30 @@ Your conclusion here.
         except Exception as e:
             return {"error": f"Failed to generate template: {str(e)}"}
     
+    @functools.cached_property
+    def _init_opts(self):
+        """Initialization options sent to clients; fixed for a server instance."""
+        return self.server.create_initialization_options()
+    
     async def run(self):
         """Run the MCP server with correct initialization."""
-        logger.info(f"Starting LaTeX MCP Server with workspace: {self.workspace_dir}")
+        logger.info("Starting LaTeX MCP Server with workspace: %s", self.workspace_dir)
+        from mcp.server.stdio import stdio_server
+        
+        stdin = _StdinLineReader.for_fd(0)
+        stdout = _StdoutFrameWriter.for_fd(1)
         try:
-            async with stdio_server() as (read_stream, write_stream):
+            async with stdio_server(stdin=stdin, stdout=stdout) as (read_stream, write_stream):
                 # FIXED: Use create_initialization_options() instead of empty dict
                 await self.server.run(
                     read_stream,
                     write_stream,
-                    self.server.create_initialization_options()
+                    self._init_opts
                 )
-        except Exception as e:
-            logger.error(f"Server error: {str(e)}")
-            print(f"Server error: {str(e)}", file=sys.stderr)
-            raise
+        finally:
+            for stream in (stdin, stdout):
+                if stream is not None:
+                    stream.close()
 
     async def change_workspace(self, new_workspace: str) -> Dict[str, Any]:
         """
@@ -790,79 +1231,165 @@ Your conclusion here.
         Returns:
             Dictionary with operation result
         """
-        try:
-            new_path = Path(new_workspace).resolve()
-            
-            # Create directory if it doesn't exist
-            new_path.mkdir(parents=True, exist_ok=True)
-            
-            # Store old workspace for reference
-            old_workspace = str(self.workspace_dir)
-            
-            # Update workspace
-            self.workspace_dir = new_path
-            
+        old_workspace = str(self.workspace_dir)
+        
+        # Re-selecting the current workspace needs no filesystem access
+        if os.fspath(new_workspace) == old_workspace:
             return {
                 "success": True,
-                "message": "Workspace changed successfully",
+                "message": "Workspace unchanged",
                 "old_workspace": old_workspace,
-                "new_workspace": str(new_path)
+                "new_workspace": old_workspace
             }
+        
+        try:
+            new_path = Path(new_workspace).resolve(strict=False)
             
+            # Create directory if it doesn't exist
+            if not os.path.isdir(new_path):
+                new_path.mkdir(parents=True, exist_ok=True)
         except Exception as e:
             return {"error": f"Failed to change workspace: {str(e)}"}
+        
+        # Update workspace
+        self.workspace_dir = new_path
+        
+        return {
+            "success": True,
+            "message": "Workspace changed successfully",
+            "old_workspace": old_workspace,
+            "new_workspace": str(new_path)
+        }
 
-def main():
-    """Main entry point for the MCP LaTeX Server."""
-    import argparse
+
+def _fast_loop_factory() -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    """
+    Select uvloop (winloop on Windows) as the event loop if it is installed.
     
-    parser = argparse.ArgumentParser(
-        description='MCP Server for LaTeX integration with Claude Desktop',
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+    Returns:
+        Loop factory for asyncio.run() on Python 3.12+, or None when the
+        default loop should be used (or, before 3.12, the policy was set)
+    """
+    try:
+        if sys.platform == 'win32':
+            import winloop as fast_loop
+        else:
+            import uvloop as fast_loop
+    except ImportError:
+        return None
+    
+    logger.info("Using %s event loop", fast_loop.__name__)
+    if sys.version_info >= (3, 12):
+        return fast_loop.new_event_loop
+    
+    # asyncio.run() has no loop_factory before 3.12; policies are deprecated
+    # from 3.14 on, so only fall back to them here
+    asyncio.set_event_loop_policy(fast_loop.EventLoopPolicy())
+    return None
+
+
+_VERSION = 'MCP LaTeX Server 1.2.0 - Fixed'
+
+_LOG_LEVELS = frozenset({'DEBUG', 'INFO', 'WARNING', 'ERROR'})
+
+_USAGE = ("usage: mcp_latex_server.py [-h] [--workspace WORKSPACE] "
+          "[--log-level {DEBUG,INFO,WARNING,ERROR}] [--version]")
+
+_HELP = _USAGE + """
+
+MCP Server for LaTeX integration with Claude Desktop
+
+options:
+  -h, --help            show this help message and exit
+  --workspace WORKSPACE
+                        Default workspace directory for LaTeX projects (default: current directory)
+  --log-level {DEBUG,INFO,WARNING,ERROR}
+                        Set the logging level (default: INFO)
+  --version             show program's version number and exit
+
 Examples:
     python mcp_latex_server.py --workspace C:/LaTeX/Projects
     python mcp_latex_server.py --workspace ~/Documents/LaTeX
 
 For more information, visit the documentation.
-        """
-    )
-    
-    parser.add_argument(
-        '--workspace', 
-        type=str, 
-        default=os.getcwd(),
-        help='Default workspace directory for LaTeX projects (default: current directory)'
-    )
-    
-    parser.add_argument(
-        '--log-level',
-        type=str,
-        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
-        default='INFO',
-        help='Set the logging level (default: INFO)'
-    )
-    
-    parser.add_argument(
-        '--version',
-        action='version',
-        version='MCP LaTeX Server 1.2.0 - Fixed'
-    )
-    
-    args = parser.parse_args()
+"""
+
+
+def _usage_error(message: str) -> None:
+    """Print a usage error and exit with status 2, like argparse does."""
+    print(_USAGE, file=sys.stderr)
+    print(f"mcp_latex_server.py: error: {message}", file=sys.stderr)
+    sys.exit(2)
+
+
+def _parse_args(argv: List[str]) -> Dict[str, str]:
+    """
+    Parse command-line arguments.
+    
+    A plain scan of argv: the server only has three options and is
+    respawned by the client often, so argparse's setup cost isn't worth it.
+    
+    Args:
+        argv: Command-line arguments without the program name
+        
+    Returns:
+        Dictionary with 'workspace' and 'log_level'
+    """
+    args = {'workspace': _DEFAULT_WORKSPACE, 'log_level': 'INFO'}
+    options = {'--workspace': 'workspace', '--log-level': 'log_level'}
+    
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        i += 1
+        
+        if arg in ('-h', '--help'):
+            print(_HELP)
+            sys.exit(0)
+        if arg == '--version':
+            print(_VERSION)
+            sys.exit(0)
+        
+        name, sep, value = arg.partition('=')
+        if name not in options:
+            _usage_error(f"unrecognized arguments: {arg}")
+        if not sep:
+            # Like argparse, a following option means the value is missing
+            if i >= len(argv) or argv[i].startswith('--'):
+                _usage_error(f"argument {name}: expected one argument")
+            value = argv[i]
+            i += 1
+        args[options[name]] = value
+    
+    if args['log_level'] not in _LOG_LEVELS:
+        choices = ', '.join(f"'{level}'" for level in sorted(_LOG_LEVELS))
+        _usage_error(f"argument --log-level: invalid choice: '{args['log_level']}' (choose from {choices})")
+    
+    return args
+
+
+def main():
+    """Main entry point for the MCP LaTeX Server."""
+    args = _parse_args(sys.argv[1:])
     
     # Set logging level
-    logging.getLogger().setLevel(getattr(logging, args.log_level))
+    logging.getLogger().setLevel(getattr(logging, args['log_level']))
+    
+    # Use a faster event loop when one is installed
+    loop_factory = _fast_loop_factory()
     
     # Create and run server
     try:
-        server = LaTeXServer(workspace_dir=args.workspace)
-        asyncio.run(server.run())
+        server = LaTeXServer(workspace_dir=args['workspace'])
+        if loop_factory is not None:
+            asyncio.run(server.run(), loop_factory=loop_factory)
+        else:
+            asyncio.run(server.run())
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
         print("Server stopped by user", file=sys.stderr)
     except Exception as e:
-        logger.error(f"Server error: {str(e)}")
+        logger.error("Server error: %s", e)
         print(f"Server error: {str(e)}", file=sys.stderr)
         sys.exit(1)
 